@@ -0,0 +1,52 @@
+import os
+import pickle
+import hashlib
+import tempfile
+from typing import Dict, Any, Optional
+
+# Default directory (relative to the working directory) for on-disk analysis caches; caching is opt-in
+CACHE_DIR = '.newtd_cache'
+
+
+def repo_cache_dir(base_dir: str, repo_key: str) -> str:
+    """Return a per-repository cache directory under `base_dir`, so analyzing several repos doesn't mix entries."""
+    return os.path.join(base_dir, hashlib.sha1(repo_key.encode('utf-8')).hexdigest()[:16])
+
+
+def load_cache(cache_dir: Optional[str], file_name: str, version: int) -> Optional[Dict[str, Any]]:
+    """Load a cache payload, or None if caching is off or the cache is missing, unreadable or from another version."""
+    if not cache_dir:
+        return None
+    
+    try:
+        with open(os.path.join(cache_dir, file_name), 'rb') as f:
+            cache = pickle.load(f)
+    except Exception:
+        return None
+    
+    if not isinstance(cache, dict) or cache.get('version') != version:
+        return None
+    return cache
+
+
+def save_cache(cache_dir: Optional[str], file_name: str, version: int, payload: Dict[str, Any]) -> None:
+    """Persist a cache payload, replacing the previous cache file atomically."""
+    if not cache_dir:
+        return
+    
+    cache_path = os.path.join(cache_dir, file_name)
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # A unique temp file per writer, so concurrent analyses can't clobber each other's
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=file_name + '.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(dict(payload, version=version), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not write cache {cache_path}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
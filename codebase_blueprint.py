@@ -1,89 +1,218 @@
 import os
 import re
 import ast
-from typing import Dict, Any, List, Set, Tuple, Optional
+import sys
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, FrozenSet, List, NamedTuple, Set, Tuple, Optional
 from collections import defaultdict
+from functools import partial
+
+from analysis_cache import load_cache, save_cache
+from dependency_analyzer import DEPENDENCY_PATTERNS
 
 # File extensions that support AST parsing (Python)
 AST_SUPPORTED_EXTENSIONS = {'.py'}
 
+# Below this many candidate files, process start-up costs more than it saves
+PARALLEL_MIN_FILES = 50
+
+# Never fork the (possibly multi-threaded) caller; forkserver isn't available on Windows
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# On-disk cache of per-file structures; bump the version whenever CodeStructure changes shape
+BLUEPRINT_CACHE_FILE = 'blueprint.pkl'
+BLUEPRINT_CACHE_VERSION = 6
+
 # Regex patterns for different languages
 CLASS_PATTERNS = {
-    '.py': r'^\s*class\s+(\w+)(?:\([^)]+\))?\s*:',
-    '.js': r'^\s*(?:export\s+)?(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+[\w.]+)?\s*{',
-    '.ts': r'^\s*(?:export\s+)?(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+[\w.]+)?(?:\s+implements\s+[\w.,\s]+)?\s*{',
-    '.java': r'^\s*(?:public|private|protected)?\s*(?:abstract|final)?\s*class\s+(\w+)(?:\s+extends\s+[\w.]+)?(?:\s+implements\s+[\w.,\s]+)?\s*{',
-    '.cs': r'^\s*(?:public|private|protected|internal)?\s*(?:abstract|sealed|static)?\s*class\s+(\w+)(?:\s*:\s*[\w.,\s]+)?\s*{',
-    '.cpp': r'^\s*(?:class|struct)\s+(\w+)(?:\s*:\s*(?:public|private|protected)\s+[\w.]+)?\s*{',
-    '.c': r'^\s*typedef\s+struct\s+(\w+)',
-    '.dart': r'^\s*(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+[\w.]+)?(?:\s+implements\s+[\w.,\s]+)?\s*{',
-    '.rs': r'^\s*(?:pub\s+)?(?:struct|enum|impl)\s+(\w+)',
-    '.go': r'^\s*type\s+(\w+)\s+struct\s*{',
-    '.php': r'^\s*(?:abstract\s+)?(?:final\s+)?class\s+(\w+)(?:\s+extends\s+[\w\\]+)?(?:\s+implements\s+[\w\\,]+)?\s*{',
-    '.kt': r'^\s*(?:data\s+|sealed\s+|abstract\s+|open\s+)?(?:class|interface|object)\s+(\w+)(?:\s*:\s*[\w.,\s]+)?\s*{',
+    '.py': re.compile(r'^\s*class\s+(\w+)(?:\([^)]+\))?\s*:'),
+    '.js': re.compile(r'^\s*(?:export\s+)?(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+[\w.]+)?\s*{'),
+    '.ts': re.compile(r'^\s*(?:export\s+)?(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+[\w.]+)?(?:\s+implements\s+[\w.,\s]+)?\s*{'),
+    '.java': re.compile(r'^\s*(?:public|private|protected)?\s*(?:abstract|final)?\s*class\s+(\w+)(?:\s+extends\s+[\w.]+)?(?:\s+implements\s+[\w.,\s]+)?\s*{'),
+    '.cs': re.compile(r'^\s*(?:public|private|protected|internal)?\s*(?:abstract|sealed|static)?\s*class\s+(\w+)(?:\s*:\s*[\w.,\s]+)?\s*{'),
+    '.cpp': re.compile(r'^\s*(?:class|struct)\s+(\w+)(?:\s*:\s*(?:public|private|protected)\s+[\w.]+)?\s*{'),
+    '.c': re.compile(r'^\s*typedef\s+struct\s+(\w+)'),
+    '.dart': re.compile(r'^\s*(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+[\w.]+)?(?:\s+implements\s+[\w.,\s]+)?\s*{'),
+    '.rs': re.compile(r'^\s*(?:pub\s+)?(?:struct|enum|impl)\s+(\w+)'),
+    '.go': re.compile(r'^\s*type\s+(\w+)\s+struct\s*{'),
+    '.php': re.compile(r'^\s*(?:abstract\s+)?(?:final\s+)?class\s+(\w+)(?:\s+extends\s+[\w\\]+)?(?:\s+implements\s+[\w\\,]+)?\s*{'),
+    '.kt': re.compile(r'^\s*(?:data\s+|sealed\s+|abstract\s+|open\s+)?(?:class|interface|object)\s+(\w+)(?:\s*:\s*[\w.,\s]+)?\s*{'),
 }
 
 FUNCTION_PATTERNS = {
-    '.py': r'^\s*(?:async\s+)?(?:def|async def)\s+(\w+)\s*\(',
-    '.js': r'^\s*(?:export\s+)?(?:async\s+)?(?:function\s+(\w+)|const\s+(\w+)\s*=\s*(?:async\s+)?\s*\(|(\w+)\s*:\s*\([^)]*\)\s*=>)',
-    '.ts': r'^\s*(?:export\s+)?(?:async\s+)?(?:function\s+(\w+)|(?:public|private|protected)?\s*(?:async\s+)?(\w+)\s*\(|const\s+(\w+)\s*[:=]\s*(?:async\s+)?)',
-    '.java': r'^\s*(?:public|private|protected)?\s*(?:static)?\s*(?:[\w<>]+\s+)?(\w+)\s*\(',
-    '.cs': r'^\s*(?:public|private|protected|internal)?\s*(?:static|virtual|override|async)?\s*(?:[\w<>]+\s+)?(\w+)\s*\(',
-    '.cpp': r'^\s*(?:[\w:<>]+\s+)?(\w+)\s*::\s*(\w+)\s*\(|^\s*(?:inline\s+)?(?:[\w:<>]+\s+)?(\w+)\s*\(',
-    '.c': r'^\s*(?:[\w\s]+\s+)?(\w+)\s*\(',
-    '.dart': r'^\s*(?:[\w<>]+\s+)?(\w+)\s*\([^)]*\)\s*(?::\s*[\w<>]+)?\s*{',
-    '.rs': r'^\s*(?:pub\s+)?(?:async\s+)?fn\s+(\w+)\s*\(',
-    '.go': r'^\s*func\s+(?:\(\s*[\w*]+\s+[\w]+\s*\)\s+)?(\w+)\s*\(',
-    '.php': r'^\s*(?:public|private|protected)?\s*(?:static)?\s*(?:function\s+|fn\s+)(\w+)\s*\(',
-    '.kt': r'^\s*(?:fun\s+|override\s+fun\s+|private\s+fun\s+|public\s+fun\s+)(\w+)\s*\(',
+    '.py': re.compile(r'^\s*(?:async\s+)?(?:def|async def)\s+(\w+)\s*\('),
+    '.js': re.compile(r'^\s*(?:export\s+)?(?:async\s+)?(?:function\s+(\w+)|const\s+(\w+)\s*=\s*(?:async\s+)?\s*\(|(\w+)\s*:\s*\([^)]*\)\s*=>)'),
+    '.ts': re.compile(r'^\s*(?:export\s+)?(?:async\s+)?(?:function\s+(\w+)|(?:public|private|protected)?\s*(?:async\s+)?(\w+)\s*\(|const\s+(\w+)\s*[:=]\s*(?:async\s+)?)'),
+    '.java': re.compile(r'^\s*(?:public|private|protected)?\s*(?:static)?\s*(?:[\w<>]+\s+)?(\w+)\s*\('),
+    '.cs': re.compile(r'^\s*(?:public|private|protected|internal)?\s*(?:static|virtual|override|async)?\s*(?:[\w<>]+\s+)?(\w+)\s*\('),
+    '.cpp': re.compile(r'^\s*(?:[\w:<>]+\s+)?(\w+)\s*::\s*(\w+)\s*\(|^\s*(?:inline\s+)?(?:[\w:<>]+\s+)?(\w+)\s*\('),
+    '.c': re.compile(r'^\s*(?:[\w\s]+\s+)?(\w+)\s*\('),
+    '.dart': re.compile(r'^\s*(?:[\w<>]+\s+)?(\w+)\s*\([^)]*\)\s*(?::\s*[\w<>]+)?\s*{'),
+    '.rs': re.compile(r'^\s*(?:pub\s+)?(?:async\s+)?fn\s+(\w+)\s*\('),
+    '.go': re.compile(r'^\s*func\s+(?:\(\s*[\w*]+\s+[\w]+\s*\)\s+)?(\w+)\s*\('),
+    '.php': re.compile(r'^\s*(?:public|private|protected)?\s*(?:static)?\s*(?:function\s+|fn\s+)(\w+)\s*\('),
+    '.kt': re.compile(r'^\s*(?:fun\s+|override\s+fun\s+|private\s+fun\s+|public\s+fun\s+)(\w+)\s*\('),
 }
 
 LOOP_PATTERNS = {
-    '.py': [r'^\s*for\s+', r'^\s*while\s+', r'^\s*async\s+for\s+'],
-    '.js': [r'^\s*for\s*\(', r'^\s*while\s*\(', r'^\s*for\s*\([\w\s]+\s+in\s+', r'^\s*for\s*\([\w\s]+\s+of\s+'],
-    '.ts': [r'^\s*for\s*\(', r'^\s*while\s*\(', r'^\s*for\s*\([\w\s]+\s+in\s+', r'^\s*for\s*\([\w\s]+\s+of\s+'],
-    '.java': [r'^\s*for\s*\(', r'^\s*while\s*\(', r'^\s*for\s*\([\w\s]+\s*:\s*'],
-    '.cs': [r'^\s*for\s*\(', r'^\s*while\s*\(', r'^\s*foreach\s*\('],
-    '.cpp': [r'^\s*for\s*\(', r'^\s*while\s*\(', r'^\s*for\s*\([\w\s]+\s*:\s*'],
-    '.c': [r'^\s*for\s*\(', r'^\s*while\s*\('],
-    '.dart': [r'^\s*for\s*\(', r'^\s*while\s*\(', r'^\s*for\s*\([\w\s]+\s+in\s+'],
-    '.rs': [r'^\s*for\s+', r'^\s*while\s+', r'^\s*loop\s+'],
-    '.go': [r'^\s*for\s+', r'^\s*for\s+[\w]+\s*:=\s*range'],
-    '.php': [r'^\s*for\s*\(', r'^\s*while\s*\(', r'^\s*foreach\s*\('],
-    '.kt': [r'^\s*for\s*\(', r'^\s*while\s*\(', r'^\s*for\s*\([\w\s]+\s+in\s+'],
+    '.py': [re.compile(r'^\s*for\s+'), re.compile(r'^\s*while\s+'), re.compile(r'^\s*async\s+for\s+')],
+    '.js': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\('), re.compile(r'^\s*for\s*\([\w\s]+\s+in\s+'), re.compile(r'^\s*for\s*\([\w\s]+\s+of\s+')],
+    '.ts': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\('), re.compile(r'^\s*for\s*\([\w\s]+\s+in\s+'), re.compile(r'^\s*for\s*\([\w\s]+\s+of\s+')],
+    '.java': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\('), re.compile(r'^\s*for\s*\([\w\s]+\s*:\s*')],
+    '.cs': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\('), re.compile(r'^\s*foreach\s*\(')],
+    '.cpp': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\('), re.compile(r'^\s*for\s*\([\w\s]+\s*:\s*')],
+    '.c': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\(')],
+    '.dart': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\('), re.compile(r'^\s*for\s*\([\w\s]+\s+in\s+')],
+    '.rs': [re.compile(r'^\s*for\s+'), re.compile(r'^\s*while\s+'), re.compile(r'^\s*loop\s+')],
+    '.go': [re.compile(r'^\s*for\s+'), re.compile(r'^\s*for\s+[\w]+\s*:=\s*range')],
+    '.php': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\('), re.compile(r'^\s*foreach\s*\(')],
+    '.kt': [re.compile(r'^\s*for\s*\('), re.compile(r'^\s*while\s*\('), re.compile(r'^\s*for\s*\([\w\s]+\s+in\s+')],
 }
 
 VARIABLE_PATTERNS = {
-    '.py': [r'^\s*([\w_][\w\d_]*)\s*=', r'^\s*([\w_][\w\d_]*)\s*:\s*[\w\[\]]+'],
-    '.js': [r'^\s*(?:var|let|const)\s+([\w_$][\w\d_$]*)'],
-    '.ts': [r'^\s*(?:var|let|const)\s+([\w_$][\w\d_$]*)\s*[:=]'],
-    '.java': [r'^\s*(?:[\w<>\[\]\s]+\s+)([\w_][\w\d_]*)\s*[=;]'],
-    '.cs': [r'^\s*(?:[\w<>\[\]\s]+\s+)([\w_][\w\d_]*)\s*[=;]'],
-    '.cpp': [r'^\s*(?:[\w:<>\[\]\s&*]+\s+)([\w_][\w\d_]*)\s*[=;]'],
-    '.c': [r'^\s*(?:[\w\s*\[\]]+\s+)([\w_][\w\d_]*)\s*[=;]'],
-    '.dart': [r'^\s*(?:var|final|const|[\w<>]+\s+)([\w_][\w\d_]*)\s*[:=]'],
-    '.rs': [r'^\s*(?:let|mut\s+let|const)\s+([\w_][\w\d_]*)\s*[:=]'],
-    '.go': [r'^\s*(?:var|const)\s+([\w_][\w\d_]*)\s*[\w=]'],
-    '.php': [r'^\s*(?:\$)([\w_][\w\d_]*)'],
-    '.kt': [r'^\s*(?:var|val)\s+([\w_][\w\d_]*)'],
+    '.py': [re.compile(r'^\s*([\w_][\w\d_]*)\s*='), re.compile(r'^\s*([\w_][\w\d_]*)\s*:\s*[\w\[\]]+')],
+    '.js': [re.compile(r'^\s*(?:var|let|const)\s+([\w_$][\w\d_$]*)')],
+    '.ts': [re.compile(r'^\s*(?:var|let|const)\s+([\w_$][\w\d_$]*)\s*[:=]')],
+    '.java': [re.compile(r'^\s*(?:[\w<>\[\]\s]+\s+)([\w_][\w\d_]*)\s*[=;]')],
+    '.cs': [re.compile(r'^\s*(?:[\w<>\[\]\s]+\s+)([\w_][\w\d_]*)\s*[=;]')],
+    '.cpp': [re.compile(r'^\s*(?:[\w:<>\[\]\s&*]+\s+)([\w_][\w\d_]*)\s*[=;]')],
+    '.c': [re.compile(r'^\s*(?:[\w\s*\[\]]+\s+)([\w_][\w\d_]*)\s*[=;]')],
+    '.dart': [re.compile(r'^\s*(?:var|final|const|[\w<>]+\s+)([\w_][\w\d_]*)\s*[:=]')],
+    '.rs': [re.compile(r'^\s*(?:let|mut\s+let|const)\s+([\w_][\w\d_]*)\s*[:=]')],
+    '.go': [re.compile(r'^\s*(?:var|const)\s+([\w_][\w\d_]*)\s*[\w=]')],
+    '.php': [re.compile(r'^\s*(?:\$)([\w_][\w\d_]*)')],
+    '.kt': [re.compile(r'^\s*(?:var|val)\s+([\w_][\w\d_]*)')],
+}
+
+# Substrings a line must contain for the matching pattern above to possibly match.
+# Checked with `in` before running the regex, which skips most lines cheaply.
+CLASS_LINE_HINTS = {
+    '.py': ('class',),
+    '.js': ('class',),
+    '.ts': ('class',),
+    '.java': ('class',),
+    '.cs': ('class',),
+    '.cpp': ('class', 'struct'),
+    '.c': ('struct',),
+    '.dart': ('class',),
+    '.rs': ('struct', 'enum', 'impl'),
+    '.go': ('struct',),
+    '.php': ('class',),
+    '.kt': ('class', 'interface', 'object'),
+}
+
+FUNCTION_LINE_HINTS = {
+    '.py': ('def',),
+    '.js': ('function', '('),
+    '.ts': ('function', '(', 'const'),
+    '.java': ('(',),
+    '.cs': ('(',),
+    '.cpp': ('(',),
+    '.c': ('(',),
+    '.dart': ('(',),
+    '.rs': ('fn',),
+    '.go': ('func',),
+    '.php': ('function', 'fn'),
+    '.kt': ('fun',),
+}
+
+LOOP_LINE_HINTS = {
+    '.py': ('for', 'while'),
+    '.js': ('for', 'while'),
+    '.ts': ('for', 'while'),
+    '.java': ('for', 'while'),
+    '.cs': ('for', 'while'),
+    '.cpp': ('for', 'while'),
+    '.c': ('for', 'while'),
+    '.dart': ('for', 'while'),
+    '.rs': ('for', 'while', 'loop'),
+    '.go': ('for',),
+    '.php': ('for', 'while'),
+    '.kt': ('for', 'while'),
+}
+
+def _loop_type(pattern: re.Pattern) -> str:
+    """Classify a loop pattern as 'for', 'while' or 'async_for' from its source text."""
+    source = pattern.pattern.lower()
+    if 'async' in source:
+        return 'async_for'
+    return 'for' if 'for' in source else 'while'
+
+
+# Each language's loop/variable pattern list fused into one alternation, so a line costs a
+# single regex search. The patterns are all ^-anchored, so the first alternative that matches
+# is the same one the list order would have picked. Loop groups are named '<type>_<index>'.
+LOOP_ALTERNATIONS = {
+    ext: re.compile('|'.join(f'(?P<{_loop_type(p)}_{i}>{p.pattern})' for i, p in enumerate(patterns)))
+    for ext, patterns in LOOP_PATTERNS.items()
 }
 
+VARIABLE_ALTERNATIONS = {
+    ext: re.compile('|'.join(p.pattern for p in patterns))
+    for ext, patterns in VARIABLE_PATTERNS.items()
+}
+
+# Helpers for pulling inheritance lists and parameter lists out of a matched line
+PAREN_CONTENT_PATTERN = re.compile(r'\(([^)]+)\)')
+PARAM_LIST_PATTERN = re.compile(r'\(([^)]*)\)')
+
+# Identifier tokens; class usage intersects these with the known class names
+WORD_PATTERN = re.compile(r'\w+')
+
+# Keywords the regex variable patterns can capture that are never variable names
+NON_VARIABLE_KEYWORDS = frozenset({'if', 'for', 'while', 'class', 'def', 'function'})
+
+# Names skipped when tracking variable usage inside functions
+SKIPPED_VARIABLE_NAMES = frozenset({
+    'self', 'cls', 'True', 'False', 'None', 'print', 'len', 'str', 'int', 'list', 'dict', 'set', 'tuple'
+})
+
+
+# Compact records for the high-volume per-file elements. Names are interned so repeated
+# identifiers share one string; records are converted to dicts only for the final result.
+class Variable(NamedTuple):
+    name: str
+    line: int
+
+
+class Loop(NamedTuple):
+    type: str  # 'for' | 'while' | 'async_for'
+    line: int
+
+
+class VariableUsage(NamedTuple):
+    var: str
+    line: int
+    type: str  # 'local' | 'member' | 'global'
+
 
 class CodeStructure:
     """Represents structural elements extracted from a file."""
+    # One instance per analyzed file, so skip the per-instance __dict__
+    __slots__ = ('file_path', 'classes', 'functions', 'variables', 'loops', 'imports', 'import_names',
+                 'class_usage', 'function_variable_usage')
+    
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.classes: List[Dict[str, Any]] = []
         self.functions: List[Dict[str, Any]] = []
-        self.variables: List[Dict[str, Any]] = []
-        self.loops: List[Dict[str, Any]] = []
+        self.variables: List[Variable] = []
+        self.loops: List[Loop] = []
         self.imports: List[str] = []
+        self.import_names: List[Tuple[str, str]] = []  # (module, imported name or '') for dependency analysis
         self.class_usage: Dict[str, List[str]] = defaultdict(list)  # class_name -> [files that use it]
-        self.function_variable_usage: Dict[str, List[Dict[str, Any]]] = defaultdict(list)  # function_name -> [{'var': name, 'line': num, 'type': 'local'|'member'|'global'}]
+        self.function_variable_usage: Dict[str, List[VariableUsage]] = defaultdict(list)  # function_name -> usages
 
 
-class NodeVisitor(ast.NodeVisitor):
-    """Custom visitor to track parent nodes."""
+class NodeVisitor:
+    """
+    Walks a module AST once in pre-order, tracking the enclosing class/function.
+    Handlers are dispatched by node type; a handler may return a callable that runs
+    once the node's subtree has been visited (used to restore class/function context).
+    """
     def __init__(self, structure: CodeStructure):
         self.structure = structure
         self.current_class = None
@@ -91,11 +220,82 @@ class NodeVisitor(ast.NodeVisitor):
         self.current_function = None
         self.function_stack = []
         self.class_members_cache = {}  # Cache class members for each class
+        self._var_last_line: Dict[str, int] = {}  # Variable name -> line it was last recorded at
+        self._usage_seen: Dict[str, Set[Tuple[str, int]]] = defaultdict(set)  # function -> {(var, line)}
+        self._class_frames: List[Dict[str, Any]] = []  # Open classes, innermost last
+        self._handlers = {
+            ast.ClassDef: self.visit_ClassDef,
+            ast.FunctionDef: self.visit_FunctionDef,
+            ast.AsyncFunctionDef: self.visit_AsyncFunctionDef,
+            ast.Import: self.visit_Import,
+            ast.ImportFrom: self.visit_ImportFrom,
+            ast.For: self.visit_For,
+            ast.AsyncFor: self.visit_AsyncFor,
+            ast.While: self.visit_While,
+            ast.Assign: self.visit_Assign,
+            ast.AnnAssign: self.visit_AnnAssign,
+            ast.Name: self.visit_Name,
+            ast.Attribute: self.visit_Attribute,
+        }
     
-    def visit_ClassDef(self, node):
-        methods = []
-        members = []
+    def visit(self, node):
+        """
+        Visit `node` and its descendants in the same order as ast.NodeVisitor, using an
+        explicit stack instead of recursion so deeply nested code can't hit the recursion limit.
+        """
+        handlers = self._handlers
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if not isinstance(item, ast.AST):
+                # Exit callback pushed beneath a node's children
+                item()
+                continue
+            
+            handler = handlers.get(type(item))
+            if handler is not None:
+                on_exit = handler(item)
+                if on_exit is not None:
+                    stack.append(on_exit)
+            
+            children = list(ast.iter_child_nodes(item))
+            children.reverse()
+            stack.extend(children)
+    
+    def _class_body_frame(self):
+        """Return the innermost class frame if the walk is directly in its body (not inside a method)."""
+        if self.current_class and self._class_frames:
+            frame = self._class_frames[-1]
+            if frame['function_depth'] == len(self.function_stack):
+                return frame
+        return None
+    
+    def _add_member(self, name: str):
+        frame = self._class_body_frame()
+        if frame is not None and name not in frame['record']['members']:
+            frame['record']['members'].append(name)
+    
+    def _leave_class(self, old_class):
+        frame = self._class_frames.pop()
+        
+        # Members are collected as the class body is walked, so names used in a method
+        # before a later class-level assignment were recorded as local/global; fix them up
+        members = set(frame['record']['members'])
+        for usages, index in frame['provisional_usages']:
+            usage = usages[index]
+            if usage.var in members:
+                usages[index] = usage._replace(type='member')
         
+        self.current_class = old_class
+        if self.class_stack:
+            self.class_stack.pop()
+    
+    def _leave_function(self, old_function):
+        self.current_function = old_function
+        if self.function_stack:
+            self.function_stack.pop()
+    
+    def visit_ClassDef(self, node):
         # Extract base classes
         bases = []
         for base in node.bases:
@@ -112,49 +312,34 @@ class NodeVisitor(ast.NodeVisitor):
         self.current_class = node.name
         self.class_stack.append(node.name)
         
-        # Visit class body to extract methods and members
-        for item in node.body:
-            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                methods.append(item.name)
-            elif isinstance(item, ast.Assign):
-                for target in item.targets:
-                    if isinstance(target, ast.Name):
-                        if target.id not in members:
-                            members.append(target.id)
-                    elif isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == 'self':
-                        if target.attr not in members:
-                            members.append(target.attr)
-            elif isinstance(item, ast.AnnAssign):
-                if isinstance(item.target, ast.Name):
-                    if item.target.id not in members:
-                        members.append(item.target.id)
-                elif isinstance(item.target, ast.Attribute) and isinstance(item.target.value, ast.Name) and item.target.value.id == 'self':
-                    if item.target.attr not in members:
-                        members.append(item.target.attr)
-        
-        self.structure.classes.append({
+        # Methods and members are filled in by the child handlers as the body is walked
+        class_info = {
             'name': node.name,
             'line': node.lineno,
-            'methods': methods,
-            'members': members,
+            'methods': [],
+            'members': [],
             'inheritance': bases,
             'loc': len([n for n in node.body if not isinstance(n, (ast.Expr, ast.Pass))])
+        }
+        self.structure.classes.append(class_info)
+        self._class_frames.append({
+            'record': class_info,
+            'function_depth': len(self.function_stack),
+            'provisional_usages': [],  # (usage list, index) recorded before all members were known
         })
         
         # Cache class members for variable usage tracking
-        self.class_members_cache[node.name] = members
-        
-        # Visit children
-        self.generic_visit(node)
+        self.class_members_cache[node.name] = class_info['members']
         
-        # Restore previous class context
-        self.current_class = old_class
-        if self.class_stack:
-            self.class_stack.pop()
+        # Restore previous class context once the children have been visited
+        return partial(self._leave_class, old_class)
     
     def visit_FunctionDef(self, node):
         # Track both top-level functions and methods
         params = [arg.arg for arg in node.args.args]
+        frame = self._class_body_frame()
+        if frame is not None:
+            frame['record']['methods'].append(node.name)
         func_full_name = f"{self.current_class}.{node.name}" if self.current_class else node.name
         
         if not self.current_class:
@@ -171,17 +356,15 @@ class NodeVisitor(ast.NodeVisitor):
         self.current_function = func_full_name
         self.function_stack.append(func_full_name)
         
-        # Visit function body to track variable usage
-        self.generic_visit(node)
-        
-        # Restore previous function context
-        self.current_function = old_function
-        if self.function_stack:
-            self.function_stack.pop()
+        # Visit function body to track variable usage, then restore previous function context
+        return partial(self._leave_function, old_function)
     
     def visit_AsyncFunctionDef(self, node):
         # Track both top-level functions and methods
         params = [arg.arg for arg in node.args.args]
+        frame = self._class_body_frame()
+        if frame is not None:
+            frame['record']['methods'].append(node.name)
         func_full_name = f"{self.current_class}.{node.name}" if self.current_class else node.name
         
         if not self.current_class:
@@ -198,69 +381,76 @@ class NodeVisitor(ast.NodeVisitor):
         self.current_function = func_full_name
         self.function_stack.append(func_full_name)
         
-        # Visit function body to track variable usage
-        self.generic_visit(node)
-        
-        # Restore previous function context
-        self.current_function = old_function
-        if self.function_stack:
-            self.function_stack.pop()
+        # Visit function body to track variable usage, then restore previous function context
+        return partial(self._leave_function, old_function)
     
     def visit_Import(self, node):
         for alias in node.names:
             self.structure.imports.append(alias.name)
-        self.generic_visit(node)
+            self.structure.import_names.append((alias.name, ''))
     
     def visit_ImportFrom(self, node):
         if node.module:
             self.structure.imports.append(node.module)
-        self.generic_visit(node)
+        # Imported names may be submodules (`from pkg import module`); dependency analysis resolves them
+        for alias in node.names:
+            self.structure.import_names.append((node.module or '', alias.name if alias.name != '*' else ''))
     
     def visit_For(self, node):
-        self.structure.loops.append({
-            'type': 'for',
-            'line': node.lineno
-        })
-        self.generic_visit(node)
+        self.structure.loops.append(Loop('for', node.lineno))
     
     def visit_AsyncFor(self, node):
-        self.structure.loops.append({
-            'type': 'async_for',
-            'line': node.lineno
-        })
-        self.generic_visit(node)
+        self.structure.loops.append(Loop('async_for', node.lineno))
     
     def visit_While(self, node):
-        self.structure.loops.append({
-            'type': 'while',
-            'line': node.lineno
-        })
-        self.generic_visit(node)
+        self.structure.loops.append(Loop('while', node.lineno))
     
     def visit_Assign(self, node):
         # Only track module-level variables
         if not self.current_class:
             for target in node.targets:
                 if isinstance(target, ast.Name):
-                    var_info = {
-                        'name': target.id,
-                        'line': node.lineno
-                    }
                     # Avoid duplicates
-                    if not any(v['name'] == target.id and abs(v['line'] - node.lineno) < 10 for v in self.structure.variables):
-                        self.structure.variables.append(var_info)
-        self.generic_visit(node)
+                    prev_line = self._var_last_line.get(target.id)
+                    if prev_line is None or abs(prev_line - node.lineno) >= 10:
+                        self.structure.variables.append(Variable(sys.intern(target.id), node.lineno))
+                        self._var_last_line[target.id] = node.lineno
+        else:
+            # Assignments directly in a class body are class members
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self._add_member(target.id)
+                elif isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == 'self':
+                    self._add_member(target.attr)
     
     def visit_AnnAssign(self, node):
         # Only track module-level variables
-        if not self.current_class and isinstance(node.target, ast.Name):
-            var_info = {
-                'name': node.target.id,
-                'line': node.lineno
-            }
-            if not any(v['name'] == node.target.id and abs(v['line'] - node.lineno) < 10 for v in self.structure.variables):
-                self.structure.variables.append(var_info)
-        self.generic_visit(node)
+        if not self.current_class:
+            if isinstance(node.target, ast.Name):
+                prev_line = self._var_last_line.get(node.target.id)
+                if prev_line is None or abs(prev_line - node.lineno) >= 10:
+                    self.structure.variables.append(Variable(sys.intern(node.target.id), node.lineno))
+                    self._var_last_line[node.target.id] = node.lineno
+        else:
+            # Annotated assignments directly in a class body are class members
+            if isinstance(node.target, ast.Name):
+                self._add_member(node.target.id)
+            elif isinstance(node.target, ast.Attribute) and isinstance(node.target.value, ast.Name) and node.target.value.id == 'self':
+                self._add_member(node.target.attr)
+    
+    def _record_usage(self, var_name: str, line: int, var_type: str) -> Optional[Tuple[List[VariableUsage], int]]:
+        """
+        Append a variable usage for the current function unless (var, line) was already recorded.
+        Returns the (usage list, index) of the new record, or None for a duplicate.
+        """
+        key = (var_name, line)
+        seen = self._usage_seen[self.current_function]
+        if key in seen:
+            return None
+        seen.add(key)
+        usages = self.structure.function_variable_usage[self.current_function]
+        usages.append(VariableUsage(sys.intern(var_name), line, var_type))
+        return usages, len(usages) - 1
     
     def visit_Name(self, node):
         """Track variable name usage within functions."""
@@ -268,8 +458,7 @@ class NodeVisitor(ast.NodeVisitor):
             var_name = node.id
             
             # Skip Python built-ins and common keywords
-            if var_name in ['self', 'cls', 'True', 'False', 'None', 'print', 'len', 'str', 'int', 'list', 'dict', 'set', 'tuple']:
-                self.generic_visit(node)
+            if var_name in SKIPPED_VARIABLE_NAMES:
                 return
             
             # Determine variable type
@@ -281,43 +470,21 @@ class NodeVisitor(ast.NodeVisitor):
                     var_type = 'member'
                 elif var_name not in ['self']:  # Check if it's a parameter
                     # Check if it's in module-level variables
-                    if any(v['name'] == var_name for v in self.structure.variables):
+                    if var_name in self._var_last_line:
                         var_type = 'global'
             
-            # Track variable usage
-            usage_info = {
-                'var': var_name,
-                'line': node.lineno,
-                'type': var_type
-            }
-            
-            # Avoid duplicates (same variable on same line)
-            if not any(u['var'] == var_name and u['line'] == node.lineno 
-                      for u in self.structure.function_variable_usage[self.current_function]):
-                self.structure.function_variable_usage[self.current_function].append(usage_info)
-        
-        self.generic_visit(node)
+            # Track variable usage, avoiding duplicates (same variable on same line)
+            recorded = self._record_usage(var_name, node.lineno, var_type)
+            if recorded is not None and self.current_class and var_type != 'member':
+                self._class_frames[-1]['provisional_usages'].append(recorded)
     
     def visit_Attribute(self, node):
         """Track attribute access (e.g., self.member, obj.attr)."""
         if self.current_function and isinstance(node.ctx, (ast.Load, ast.Store)):
             # Check if it's self.attribute (class member access)
             if isinstance(node.value, ast.Name) and node.value.id == 'self':
-                var_name = node.attr
-                var_type = 'member'
-                
-                usage_info = {
-                    'var': var_name,
-                    'line': node.lineno,
-                    'type': var_type
-                }
-                
                 # Avoid duplicates
-                if not any(u['var'] == var_name and u['line'] == node.lineno 
-                          for u in self.structure.function_variable_usage[self.current_function]):
-                    self.structure.function_variable_usage[self.current_function].append(usage_info)
-        
-        self.generic_visit(node)
+                self._record_usage(node.attr, node.lineno, 'member')
 
 
 def analyze_python_file(file_path: str, content: str) -> CodeStructure:
@@ -331,6 +498,10 @@ def analyze_python_file(file_path: str, content: str) -> CodeStructure:
     except (SyntaxError, ValueError):
         # If AST parsing fails, fall back to regex patterns
         structure = analyze_file_with_regex(file_path, content)
+        # Keep import strings available to the dependency analysis, which reuses them for Python files
+        structure.import_names = [
+            (dep, '') for match in DEPENDENCY_PATTERNS['.py'].finditer(content) for dep in match.groups() if dep
+        ]
     
     return structure
 
@@ -348,23 +519,40 @@ def analyze_file_with_regex(file_path: str, content: str) -> CodeStructure:
     class_stack = []
     brace_count = 0
     in_class = False
+    var_last_line: Dict[str, int] = {}  # Variable name -> line it was last recorded at
+    
+    # Resolve this language's patterns once instead of per line
+    class_pattern = CLASS_PATTERNS.get(ext)
+    class_hints = CLASS_LINE_HINTS.get(ext, ())
+    function_pattern = FUNCTION_PATTERNS.get(ext)
+    function_hints = FUNCTION_LINE_HINTS.get(ext, ())
+    loop_pattern = LOOP_ALTERNATIONS.get(ext)
+    loop_hints = LOOP_LINE_HINTS.get(ext, ())
+    variable_pattern = VARIABLE_ALTERNATIONS.get(ext)
+    add_class = structure.classes.append
+    add_function = structure.functions.append
+    add_loop = structure.loops.append
+    add_variable = structure.variables.append
     
     for line_num, line in enumerate(lines, 1):
         stripped = line.strip()
+        # Blank lines can't match any pattern or change the brace count
+        if not stripped:
+            continue
         
         # Extract classes
-        if ext in CLASS_PATTERNS:
-            class_match = re.search(CLASS_PATTERNS[ext], line)
+        if class_pattern is not None and any(hint in line for hint in class_hints):
+            class_match = class_pattern.search(line)
             if class_match:
                 class_name = class_match.group(1)
                 # Extract inheritance
                 inheritance = []
                 if '(' in line and ')' in line:
-                    paren_content = re.search(r'\(([^)]+)\)', line)
+                    paren_content = PAREN_CONTENT_PATTERN.search(line)
                     if paren_content:
                         inheritance = [x.strip() for x in paren_content.group(1).split(',')]
                 
-                structure.classes.append({
+                add_class({
                     'name': class_name,
                     'line': line_num,
                     'methods': [],
@@ -377,8 +565,8 @@ def analyze_file_with_regex(file_path: str, content: str) -> CodeStructure:
                 brace_count = line.count('{') - line.count('}')
         
         # Extract functions
-        if ext in FUNCTION_PATTERNS:
-            func_match = re.search(FUNCTION_PATTERNS[ext], line)
+        if function_pattern is not None and any(hint in line for hint in function_hints):
+            func_match = function_pattern.search(line)
             if func_match:
                 func_name = func_match.group(1) if func_match.group(1) else (
                     func_match.group(2) if len(func_match.groups()) > 1 and func_match.group(2) else func_match.group(0).split()[0]
@@ -392,7 +580,7 @@ def analyze_file_with_regex(file_path: str, content: str) -> CodeStructure:
                 }
                 
                 # Try to extract parameters
-                param_match = re.search(r'\(([^)]*)\)', line)
+                param_match = PARAM_LIST_PATTERN.search(line)
                 if param_match:
                     params_str = param_match.group(1)
                     params = [p.strip().split()[0] if p.strip() else '' for p in params_str.split(',') if p.strip()]
@@ -401,41 +589,32 @@ def analyze_file_with_regex(file_path: str, content: str) -> CodeStructure:
                 if in_class and current_class is not None:
                     structure.classes[current_class]['methods'].append(func_name)
                 else:
-                    structure.functions.append(func_info)
+                    add_function(func_info)
         
         # Extract loops
-        if ext in LOOP_PATTERNS:
-            for pattern in LOOP_PATTERNS[ext]:
-                if re.search(pattern, line):
-                    loop_type = 'for' if 'for' in pattern.lower() else 'while'
-                    if 'async' in pattern.lower():
-                        loop_type = 'async_for'
-                    structure.loops.append({
-                        'type': loop_type,
-                        'line': line_num
-                    })
-                    break
+        if loop_pattern is not None and any(hint in line for hint in loop_hints):
+            loop_match = loop_pattern.search(line)
+            if loop_match:
+                loop_type = sys.intern(loop_match.lastgroup.rsplit('_', 1)[0])
+                add_loop(Loop(loop_type, line_num))
         
         # Extract variables
-        if ext in VARIABLE_PATTERNS:
-            for pattern in VARIABLE_PATTERNS[ext]:
-                var_match = re.search(pattern, line)
-                if var_match:
-                    var_name = var_match.group(1)
-                    if var_name and var_name not in ['if', 'for', 'while', 'class', 'def', 'function']:
-                        var_info = {
-                            'name': var_name,
-                            'line': line_num
-                        }
-                        
-                        if in_class and current_class is not None:
-                            if var_name not in structure.classes[current_class]['members']:
-                                structure.classes[current_class]['members'].append(var_name)
-                        else:
-                            # Avoid duplicates
-                            if not any(v['name'] == var_name and abs(v['line'] - line_num) < 5 for v in structure.variables):
-                                structure.variables.append(var_info)
-                        break
+        if variable_pattern is not None:
+            var_match = variable_pattern.search(line)
+            if var_match:
+                # Each alternative has exactly one capture group: the variable name
+                var_name = var_match.group(var_match.lastindex)
+                if var_name and var_name not in NON_VARIABLE_KEYWORDS:
+                    var_name = sys.intern(var_name)
+                    if in_class and current_class is not None:
+                        if var_name not in structure.classes[current_class]['members']:
+                            structure.classes[current_class]['members'].append(var_name)
+                    else:
+                        # Avoid duplicates
+                        prev_line = var_last_line.get(var_name)
+                        if prev_line is None or abs(prev_line - line_num) >= 5:
+                            add_variable(Variable(var_name, line_num))
+                            var_last_line[var_name] = line_num
         
         # Track class scope with braces
         if in_class:
@@ -447,86 +626,244 @@ def analyze_file_with_regex(file_path: str, content: str) -> CodeStructure:
     return structure
 
 
-def track_class_usage(blueprint_data: Dict[str, CodeStructure], repo_path: str) -> Dict[str, CodeStructure]:
-    """Track where classes are used/referenced across the codebase."""
-    # Build class name to file mapping
+def _class_files(blueprint_data: Dict[str, CodeStructure]) -> Dict[str, List[str]]:
+    """Map each class name to the files defining it, in discovery order."""
     class_to_files: Dict[str, List[str]] = defaultdict(list)
     for file_path_rel, structure in blueprint_data.items():
         for cls in structure.classes:
             class_to_files[cls['name']].append(file_path_rel)
+    return class_to_files
+
+
+def find_class_references(blueprint_data: Dict[str, CodeStructure], repo_path: str,
+                          contents: Optional[Dict[str, str]] = None,
+                          previous_class_names: Optional[Set[str]] = None,
+                          previous_references: Optional[Dict[str, Set[str]]] = None) -> Dict[str, Set[str]]:
+    """
+    Return, per file, the known class names mentioned in it as whole, case-sensitive words.
+    `contents` maps relative paths to already-read file text; files missing from it are read from disk.
+    `previous_references` holds results for files unchanged since a run that knew `previous_class_names`;
+    those files are only scanned (and read) for class names that run didn't know about.
+    """
+    class_names = _class_files(blueprint_data)
+    references: Dict[str, Set[str]] = {}
+    if not class_names:
+        return {file_path_rel: set() for file_path_rel in blueprint_data}
+    
+    previous_class_names = previous_class_names or set()
+    previous_references = previous_references or {}
+    all_names = set(class_names)
+    new_names = all_names - previous_class_names
+    
+    for file_path_rel in blueprint_data:
+        known = previous_references.get(file_path_rel)
+        if known is not None:
+            # Unchanged file: keep the names still defined, then look only for new ones
+            referenced = {name for name in known if name in class_names}
+            wanted = new_names
+            if not wanted:
+                references[file_path_rel] = referenced
+                continue
+        else:
+            referenced = set()
+            wanted = all_names
+        
+        content = contents.get(file_path_rel) if contents is not None else None
+        if content is None:
+            file_path_abs = os.path.join(repo_path, file_path_rel)
+            try:
+                with open(file_path_abs, 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read()
+            except:
+                continue
+        
+        # Tokenize once and intersect: a regex alternation of every class name
+        # would be retried at each position of the text. Names are matched
+        # case-sensitively, as in every supported language.
+        referenced.update(wanted.intersection(WORD_PATTERN.findall(content)))
+        references[file_path_rel] = referenced
+    
+    return references
+
+
+def track_class_usage(blueprint_data: Dict[str, CodeStructure], repo_path: str,
+                      contents: Optional[Dict[str, str]] = None,
+                      references: Optional[Dict[str, Set[str]]] = None) -> Dict[str, CodeStructure]:
+    """
+    Track where classes are used/referenced across the codebase.
+    A file references a class when the class name appears in it as a whole, case-sensitive word,
+    so `className` or `name` never count as uses of `Name`.
+    `references` is the output of find_class_references, if already computed; otherwise it is
+    computed here using `contents`.
+    """
+    # Build class name to file mapping
+    class_to_files = _class_files(blueprint_data)
+    if not class_to_files:
+        return blueprint_data
+    
+    if references is None:
+        references = find_class_references(blueprint_data, repo_path, contents)
     
-    # Find class usage in imports and references
+    class_order = {name: i for i, name in enumerate(class_to_files)}
     for file_path_rel, structure in blueprint_data.items():
-        file_path_abs = os.path.join(repo_path, file_path_rel)
-        content = ""
-        try:
-            with open(file_path_abs, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-        except:
+        referenced = references.get(file_path_rel)
+        if not referenced:
             continue
         
-        # Check imports and class references
-        for class_name, defining_files in class_to_files.items():
+        # Keep class_usage ordered as classes were discovered
+        for class_name in sorted(referenced, key=class_order.__getitem__):
+            defining_files = class_to_files[class_name]
             # Skip if this file defines the class
             if file_path_rel in defining_files:
                 continue
-            
-            # Check for imports or references to the class
-            patterns = [
-                rf'import.*{re.escape(class_name)}',
-                rf'from.*import.*{re.escape(class_name)}',
-                rf'\b{re.escape(class_name)}\s*\(',
-                rf'\b{re.escape(class_name)}\s*[=:]',
-                rf'new\s+{re.escape(class_name)}',
-                rf'extends\s+{re.escape(class_name)}',
-                rf':\s*{re.escape(class_name)}',
-            ]
-            
-            for pattern in patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    structure.class_usage[class_name].extend(defining_files)
-                    break
+            structure.class_usage[class_name].extend(defining_files)
     
     return blueprint_data
 
 
-def analyze_codebase_blueprint(repo_path: str, all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+def _analyze_one(file_path_abs: str, file_path_rel: str, ext: str,
+                 content: Optional[str] = None) -> Tuple[str, Optional[CodeStructure], Optional[str]]:
     """
-    Analyze codebase structure and create a blueprint.
-    Returns a dictionary with structural information.
+    Read (unless `content` is given) and analyze a single file. Top-level so it can run in a worker process.
+    Returns the content it read so class-usage tracking doesn't have to read the file again; content
+    the caller passed in is not sent back (it would cross the process boundary twice).
     """
-    blueprint_data: Dict[str, CodeStructure] = {}
+    read_content = None
+    if content is None:
+        try:
+            with open(file_path_abs, 'r', encoding='utf-8', errors='ignore') as f:
+                content = read_content = f.read()
+        except Exception:
+            return file_path_rel, None, None
+    
+    # Use AST for Python, regex for others
+    if ext == '.py':
+        structure = analyze_python_file(file_path_abs, content)
+    else:
+        structure = analyze_file_with_regex(file_path_abs, content)
     
+    return file_path_rel, structure, read_content
+
+
+def _analyze_files(candidates: List[Tuple[str, str, str, Optional[str]]]) -> List[Tuple[str, Optional[CodeStructure], Optional[str]]]:
+    """Analyze (abs_path, rel_path, ext, content) candidates, across processes when there are enough of them."""
+    workers = os.cpu_count() or 1
+    if len(candidates) >= PARALLEL_MIN_FILES and workers > 1:
+        try:
+            # The pipeline runs in Streamlit/Flask worker threads, where forking can deadlock;
+            # workers also need the caller's recursion limit for deeply nested ASTs
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                initializer=sys.setrecursionlimit,
+                initargs=(sys.getrecursionlimit(),),
+            ) as executor:
+                chunksize = max(1, len(candidates) // (workers * 4))
+                return list(executor.map(_analyze_one, *zip(*candidates), chunksize=chunksize))
+        except (BrokenProcessPool, OSError) as e:
+            print(f"⚠️ Parallel blueprint analysis unavailable ({e}); falling back to serial.")
+    
+    return [_analyze_one(*candidate) for candidate in candidates]
+
+
+def analyze_codebase_blueprint(repo_path: str, all_file_data: Dict[str, Dict[str, Any]],
+                               cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Analyze codebase structure and create a blueprint.
+    If `cache_dir` is given (one directory per repository), results are cached per file, keyed by
+    mtime/size with a content-hash fallback so fresh clones still hit. On later runs only new or changed
+    files are parsed, unchanged files are only rescanned for class names that didn't exist before, and
+    removed files drop out of the cache.
+    Returns a dictionary with structural information ('_blueprint', '_blueprint_stats') and, under
+    '_import_names', each Python file's (module, name) import pairs for analyze_dependencies.
+    """
     print("📐 Analyzing codebase structure...")
     
+    cache = load_cache(cache_dir, BLUEPRINT_CACHE_FILE, BLUEPRINT_CACHE_VERSION) or {}
+    cached_entries: Dict[str, Tuple[int, int, str, CodeStructure, FrozenSet[str]]] = cache.get('entries', {})
+    file_keys: Dict[str, Tuple[int, int, str]] = {}  # rel_path -> (mtime_ns, size, sha1)
+    previous_references: Dict[str, Set[str]] = {}  # Class references of unchanged files
+    structures: Dict[str, CodeStructure] = {}
+    contents: Dict[str, str] = {}
+    file_order: List[str] = []
+    candidates: List[Tuple[str, str, str, Optional[str]]] = []
+    
     for file_path_rel, file_data in all_file_data.items():
         if not isinstance(file_data, dict) or file_data.get('loc', 0) == 0:
             continue
         
-        file_path_abs = os.path.join(repo_path, file_path_rel)
-        if not os.path.exists(file_path_abs):
-            continue
-        
+        # Reject unsupported extensions before touching the filesystem
         ext = os.path.splitext(file_path_rel)[1]
         if ext not in CLASS_PATTERNS and ext not in FUNCTION_PATTERNS:
             continue
         
+        file_path_abs = os.path.join(repo_path, file_path_rel)
         try:
-            with open(file_path_abs, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-        except Exception:
+            st = os.stat(file_path_abs)
+        except OSError:
             continue
         
-        # Use AST for Python, regex for others
-        if ext == '.py':
-            structure = analyze_python_file(file_path_abs, content)
-        else:
-            structure = analyze_file_with_regex(file_path_abs, content)
+        file_order.append(file_path_rel)
         
-        blueprint_data[file_path_rel] = structure
+        entry = cached_entries.get(file_path_rel)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            structures[file_path_rel] = entry[3]
+            previous_references[file_path_rel] = entry[4]
+            file_keys[file_path_rel] = entry[:3]
+            continue
+        
+        content = None
+        if cache_dir:
+            try:
+                with open(file_path_abs, 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read()
+            except Exception:
+                continue
+            
+            # Fresh clones reset mtimes, so fall back to comparing content hashes
+            digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+            file_keys[file_path_rel] = (st.st_mtime_ns, st.st_size, digest)
+            if entry is not None and entry[2] == digest:
+                structures[file_path_rel] = entry[3]
+                previous_references[file_path_rel] = entry[4]
+                contents[file_path_rel] = content
+                continue
+        
+        if content is not None:
+            contents[file_path_rel] = content
+        candidates.append((file_path_abs, file_path_rel, ext, content))
+    
+    for file_path_rel, structure, content in _analyze_files(candidates):
+        if structure is not None:
+            structures[file_path_rel] = structure
+            if content is not None:
+                contents[file_path_rel] = content
+    
+    blueprint_data: Dict[str, CodeStructure] = {
+        file_path_rel: structures[file_path_rel] for file_path_rel in file_order if file_path_rel in structures
+    }
+    
+    references = find_class_references(
+        blueprint_data, repo_path, contents,
+        previous_class_names=cache.get('class_names'),
+        previous_references=previous_references,
+    )
+    # File contents are no longer needed; release them before building the result
+    del contents
+    
+    # Persist before class usage tracking adds cross-file data to the structures
+    if cache_dir:
+        save_cache(cache_dir, BLUEPRINT_CACHE_FILE, BLUEPRINT_CACHE_VERSION, {
+            'class_names': frozenset(_class_files(blueprint_data)),
+            'entries': {
+                file_path_rel: file_keys[file_path_rel] + (structure, frozenset(references[file_path_rel]))
+                for file_path_rel, structure in blueprint_data.items()
+                if file_path_rel in file_keys and file_path_rel in references
+            },
+        })
     
     # Track class usage across files
-    blueprint_data = track_class_usage(blueprint_data, repo_path)
+    blueprint_data = track_class_usage(blueprint_data, repo_path, references=references)
     
     # Convert to serializable format
     result = {
@@ -537,11 +874,13 @@ def analyze_codebase_blueprint(repo_path: str, all_file_data: Dict[str, Dict[str
         result['_blueprint'][file_path] = {
             'classes': structure.classes,
             'functions': structure.functions,
-            'variables': structure.variables,
-            'loops': structure.loops,
+            'variables': [v._asdict() for v in structure.variables],
+            'loops': [loop._asdict() for loop in structure.loops],
             'imports': structure.imports,
             'class_usage': dict(structure.class_usage),
-            'function_variable_usage': {k: v for k, v in structure.function_variable_usage.items()}
+            'function_variable_usage': {
+                k: [usage._asdict() for usage in v] for k, v in structure.function_variable_usage.items()
+            }
         }
     
     # Generate summary statistics
@@ -556,6 +895,12 @@ def analyze_codebase_blueprint(repo_path: str, all_file_data: Dict[str, Dict[str
         for class_name, using_files in structure.class_usage.items():
             class_reuse_count[class_name] += len(using_files)
     
+    # Not part of the blueprint itself: raw Python imports for analyze_dependencies
+    result['_import_names'] = {
+        file_path: structure.import_names
+        for file_path, structure in blueprint_data.items() if file_path.endswith('.py')
+    }
+    
     result['_blueprint_stats'] = {
         'total_classes': total_classes,
         'total_functions': total_functions,
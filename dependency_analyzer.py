@@ -1,72 +1,157 @@
 import os
 import re
-from typing import Dict, Any, Tuple
+import posixpath
+from typing import Dict, Any, List, Optional, Tuple
+from collections import defaultdict
 
 # Common import/include patterns for various languages
 DEPENDENCY_PATTERNS = {
-    '.py': r'(?:from|import)\s+([\w\.]+)',
-    '.js': r'(?:require|import)\s+[\'"]?([.\/a-zA-Z0-9_-]+)[\'"]?',
-    '.ts': r'(?:import|export)\s+[\'"]?([.\/a-zA-Z0-9_-]+)[\'"]?',
-    '.java': r'import\s+([\w\.]+);',
-    '.c': r'#include\s+["<]([\w\/\.]+)[">]',
-    '.cpp': r'#include\s+["<]([\w\/\.]+)[">]',
-    '.html': r'(?:<script\s+src|href)\s*=\s*["\']([^"\']+)["\']', # Basic HTML resource detection
-    '.dart': r'import\s+[\'"]?([^\'"]+)[\'"]?', # Dart imports: import 'package:...' or import 'path/to/file.dart'
-    '.rs': r'(?:use|mod|extern\s+crate)\s+([\w:\.]+)', # Rust: use crate::name, mod name, extern crate name
-    '.go': r'import\s+(?:[\w]+\s+)?["\']([^"\']+)["\']', # Go: import "package" or import alias "package"
-    '.cs': r'using\s+([\w\.]+);', # C#: using Namespace;
-    '.php': r'(?:(?:require|require_once|include|include_once)\s+[\'"]?([^\'"\s;]+)[\'"]?|use\s+([\\\w]+))', # PHP: require/include 'file', use Namespace
-    '.sh': r'(?:\.|source)\s+([^\s#]+)', # Shell: . file.sh or source file.sh
-    '.bash': r'(?:\.|source)\s+([^\s#]+)', # Bash: . file.sh or source file.sh
-    '.kt': r'import\s+([\w\.]+)', # Kotlin: import package.Class
+    '.py': re.compile(r'(?:from|import)\s+([\w\.]+)'),
+    '.js': re.compile(r'(?:require|import)\s+[\'"]?([.\/a-zA-Z0-9_-]+)[\'"]?'),
+    '.ts': re.compile(r'(?:import|export)\s+[\'"]?([.\/a-zA-Z0-9_-]+)[\'"]?'),
+    '.java': re.compile(r'import\s+([\w\.]+);'),
+    '.c': re.compile(r'#include\s+["<]([\w\/\.]+)[">]'),
+    '.cpp': re.compile(r'#include\s+["<]([\w\/\.]+)[">]'),
+    '.html': re.compile(r'(?:<script\s+src|href)\s*=\s*["\']([^"\']+)["\']'), # Basic HTML resource detection
+    '.dart': re.compile(r'import\s+[\'"]?([^\'"]+)[\'"]?'), # Dart imports: import 'package:...' or import 'path/to/file.dart'
+    '.rs': re.compile(r'(?:use|mod|extern\s+crate)\s+([\w:\.]+)'), # Rust: use crate::name, mod name, extern crate name
+    '.go': re.compile(r'import\s+(?:[\w]+\s+)?["\']([^"\']+)["\']'), # Go: import "package" or import alias "package"
+    '.cs': re.compile(r'using\s+([\w\.]+);'), # C#: using Namespace;
+    '.php': re.compile(r'(?:(?:require|require_once|include|include_once)\s+[\'"]?([^\'"\s;]+)[\'"]?|use\s+([\\\w]+))'), # PHP: require/include 'file', use Namespace
+    '.sh': re.compile(r'(?:\.|source)\s+([^\s#]+)'), # Shell: . file.sh or source file.sh
+    '.bash': re.compile(r'(?:\.|source)\s+([^\s#]+)'), # Bash: . file.sh or source file.sh
+    '.kt': re.compile(r'import\s+([\w\.]+)'), # Kotlin: import package.Class
 }
 
-def analyze_dependencies(repo_path: str, all_file_data: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-    """Analyzes dependencies (Fan-in/Fan-out) between files."""
+# Import strings starting with these are relative to the importing file's directory
+RELATIVE_IMPORT_PREFIXES = ('./', '../')
+
+
+def _dependency_path(dep: str) -> str:
+    """Normalize an import string to a '/'-separated path without leading './' or '../' parts."""
+    return '/'.join(part for part in dep.replace('\\', '/').split('/') if part not in ('', '.', '..'))
+
+
+def _resolve_dependency(dep: str, importer_dir: str, importer_ext: str,
+                        by_suffix: Dict[str, List[str]], by_stem_suffix: Dict[str, List[str]]) -> List[str]:
+    """
+    Return the repo files an import string in a file with directory `importer_dir` and extension
+    `importer_ext` may refer to, best match first. Files sharing the importer's extension come first.
+    """
+    lookups: List[Tuple[Dict[str, List[str]], str]] = []
+    dep = dep.replace('\\', '/')
+    if dep.startswith(RELATIVE_IMPORT_PREFIXES):
+        # Relative imports name a path from the importer's directory; '/'-prefixed keys are repo-rooted
+        anchored = posixpath.normpath(posixpath.join('/', importer_dir, dep))
+        lookups += [(by_suffix, anchored), (by_stem_suffix, anchored)]
     
+    dep_path = _dependency_path(dep)
+    if dep_path:
+        dep_basename = posixpath.basename(dep_path)
+        lookups.append((by_suffix, dep_path))
+        if importer_ext == '.py':
+            # Module-style imports (pkg.module) resolve to pkg/module.py
+            module_path = _dependency_path(dep.replace('.', '/')) + '.py'
+            lookups += [(by_suffix, dep_path + '.py'), (by_suffix, module_path)]
+        lookups += [(by_stem_suffix, dep_path), (by_suffix, dep_basename), (by_stem_suffix, dep_basename)]
+        if importer_ext == '.py':
+            lookups.append((by_suffix, posixpath.basename(module_path)))
+    
+    # The longest matching path suffix wins; bare basenames are the last resort
+    for index, key in lookups:
+        matches = index.get(key)
+        if matches:
+            return sorted(matches, key=lambda target_path: os.path.splitext(target_path)[1] != importer_ext)
+    return []
+
+
+def analyze_dependencies(repo_path: str, all_file_data: Dict[str, Dict[str, Any]],
+                         import_names: Optional[Dict[str, List[Tuple[str, str]]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Analyzes dependencies (Fan-in/Fan-out) between files.
+    When `import_names` (the '_import_names' mapping from analyze_codebase_blueprint) is given, Python
+    files take their imports from it instead of being re-read and scanned with DEPENDENCY_PATTERNS.
+    """
     # Initialize dependency graph
     fan_out_map: Dict[str, List[str]] = {path: [] for path in all_file_data.keys()}
     
+    # Split every path once; the loops below only do dict lookups
+    basename_of: Dict[str, str] = {path: os.path.basename(path) for path in all_file_data.keys()}
+    ext_of: Dict[str, str] = {path: os.path.splitext(basename)[1] for path, basename in basename_of.items()}
+    
+    # Index every path suffix ('pkg/utils.py', 'utils.py') with and without the extension
+    # ('pkg/utils', 'utils') so each dependency resolves with a dict lookup instead of a scan over all files.
+    # The full path is also indexed with a leading '/' for imports relative to the importing file.
+    by_suffix: Dict[str, List[str]] = defaultdict(list)
+    by_stem_suffix: Dict[str, List[str]] = defaultdict(list)
+    dir_of: Dict[str, str] = {}
+    for target_path in all_file_data.keys():
+        posix_path = target_path.replace(os.sep, '/')
+        dir_of[target_path] = posixpath.dirname(posix_path)
+        parts = posix_path.split('/')
+        ext_len = len(ext_of[target_path])
+        for suffix in ['/' + posix_path] + ['/'.join(parts[i:]) for i in range(len(parts))]:
+            by_suffix[suffix].append(target_path)
+            by_stem_suffix[suffix[:len(suffix) - ext_len]].append(target_path)
+    
+    # The same import strings ('os', 'react', ...) recur across files; resolve each once per
+    # importer extension (and, for './' or '../' imports, per importer directory)
+    resolved: Dict[Tuple[str, str, str], List[str]] = {}
+    
     # 1. Determine Fan-out (dependencies a file uses)
     for path, data in all_file_data.items():
-        file_extension = os.path.splitext(path)[1]
-        pattern = DEPENDENCY_PATTERNS.get(file_extension)
-        
-        if not pattern:
+        # Skip files with no dependency pattern before any path or I/O work
+        pattern = DEPENDENCY_PATTERNS.get(ext_of[path])
+        if pattern is None:
             continue
 
-        file_path_abs = os.path.join(repo_path, path)
-        try:
-            with open(file_path_abs, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-        except Exception:
-            continue
+        # The blueprint already parsed Python files; its AST imports have no comment/string false positives
+        if ext_of[path] == '.py' and import_names is not None and path in import_names:
+            # `from pkg import name` may import the submodule pkg.name, so try both
+            found_dependencies = set()
+            for module, name in import_names[path]:
+                if module:
+                    found_dependencies.add(module)
+                if name:
+                    found_dependencies.add(f"{module}.{name}" if module else name)
+        else:
+            file_path_abs = os.path.join(repo_path, path)
+            try:
+                with open(file_path_abs, 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read()
+            except Exception:
+                continue
             
-        found_dependencies_raw = re.findall(pattern, content)
-        # Handle cases where pattern has multiple capture groups (returns tuples)
-        found_dependencies = set()
-        for dep in found_dependencies_raw:
-            if isinstance(dep, tuple):
-                # Flatten tuple by taking non-empty values
-                found_dependencies.update([d for d in dep if d])
-            else:
-                found_dependencies.add(dep)
-
+            # Stream matches straight into the set; patterns with several
+            # capture groups (PHP) leave the unmatched ones as None
+            found_dependencies = set()
+            for match in pattern.finditer(content):
+                for dep in match.groups():
+                    if dep:
+                        found_dependencies.add(dep)
+        
+        importer_ext = ext_of[path]
+        importer_dir = dir_of[path]
+        seen = set()
         for dep in found_dependencies:
-            # Simple heuristic: look for paths that match
-            for target_path in all_file_data.keys():
-                if dep in target_path or os.path.basename(dep) in target_path:
-                    if target_path != path: # Don't count self-dependency
+            key = (dep, importer_dir if dep.replace('\\', '/').startswith(RELATIVE_IMPORT_PREFIXES) else '', importer_ext)
+            candidates = resolved.get(key)
+            if candidates is None:
+                candidates = resolved[key] = _resolve_dependency(dep, importer_dir, importer_ext, by_suffix, by_stem_suffix)
+            for target_path in candidates:
+                if target_path != path: # Don't count self-dependency
+                    if target_path not in seen:
+                        seen.add(target_path)
                         fan_out_map[path].append(target_path)
-                        break
+                    break
         
         # Store Fan-out count
-        data['fan_out'] = len(set(fan_out_map[path]))
+        data['fan_out'] = len(fan_out_map[path])
 
     # 2. Determine Fan-in (dependencies that use the file)
     fan_in_map: Dict[str, int] = {path: 0 for path in all_file_data.keys()}
     for dependents, targets in fan_out_map.items():
-        for target in set(targets):
+        for target in targets:
             fan_in_map[target] = fan_in_map.get(target, 0) + 1
             
     # Update data with Fan-in counts
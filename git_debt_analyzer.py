@@ -4,7 +4,7 @@ import shutil
 import tempfile
 import sys
 import stat
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # Assume these modules are present in your directory
 from repo_cloner import clone_repository
@@ -15,6 +15,7 @@ from metrics_calculator import compute_advanced_metrics
 from report_generator import find_main_contributing_factor, generate_cli_report 
 from contributor_analyzer import analyze_contributor_efficiency
 from codebase_blueprint import analyze_codebase_blueprint
+from analysis_cache import CACHE_DIR, repo_cache_dir
 
 
 # Simplified onerror handler for cross-platform cleanup resilience
@@ -31,8 +32,11 @@ def onerror(func, path, exc_info):
     else:
         raise
 
-def run_analysis_pipeline(repo_url: str) -> Dict[str, Any]:
-    """Runs the full analysis pipeline and returns the complete data dictionary."""
+def run_analysis_pipeline(repo_url: str, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs the full analysis pipeline and returns the complete data dictionary.
+    If `cache_dir` is given, blueprint results are cached in a per-repository directory under it.
+    """
     
     temp_dir = None
     all_file_data: Dict[str, Any] = {}
@@ -55,22 +59,27 @@ def run_analysis_pipeline(repo_url: str) -> Dict[str, Any]:
         print("🕰️ Analyzing Git history...")
         all_file_data = analyze_git_history(temp_dir, all_file_data)
         
-        # --- 4. Dependency Analysis ---
+        # --- 4. Codebase Blueprint Analysis ---
+        # Runs before dependency analysis so Python imports come from the blueprint's AST pass
+        print("📐 Generating codebase blueprint...")
+        blueprint_cache_dir = repo_cache_dir(cache_dir, repo_url) if cache_dir else None
+        blueprint_data = analyze_codebase_blueprint(temp_dir, all_file_data, cache_dir=blueprint_cache_dir)
+        import_names = blueprint_data.pop('_import_names')
+        
+        # --- 5. Dependency Analysis ---
         print("🔗 Analyzing file dependencies...")
-        all_file_data = analyze_dependencies(temp_dir, all_file_data)
+        all_file_data = analyze_dependencies(temp_dir, all_file_data, import_names=import_names)
 
-        # --- 5. Compute Advanced Metrics (Risk Scores, Entropy) ---
+        # --- 6. Compute Advanced Metrics (Risk Scores, Entropy) ---
         print("📊 Computing Risk Scores and Ownership Entropy...")
         all_file_data = compute_advanced_metrics(all_file_data)
         
-        # --- 6. Contributor Analysis ---
+        # --- 7. Contributor Analysis ---
         print("👤 Analyzing contributor efficiency...")
         contributor_data = analyze_contributor_efficiency(all_file_data)
         all_file_data['_contributor_stats'] = contributor_data
         
-        # --- 7. Codebase Blueprint Analysis ---
-        print("📐 Generating codebase blueprint...")
-        blueprint_data = analyze_codebase_blueprint(temp_dir, all_file_data)
+        # Blueprint results are added only now so earlier stages see just the per-file entries
         all_file_data.update(blueprint_data)
         
         # --- 8. Prepare Data for Reporting ---
@@ -110,6 +119,8 @@ def main():
     """CLI Entry point: Runs analysis and generates the CLI report."""
     parser = argparse.ArgumentParser(description="Git Debt Analyzer: Clones a Git repository and performs analysis.")
     parser.add_argument('--repo-url', required=True, help='URL of the Git repository to analyze')
+    parser.add_argument('--cache-dir', nargs='?', const=CACHE_DIR, default=None,
+                        help=f'Cache per-file analysis results for faster reruns (default directory: {CACHE_DIR})')
     
     args = parser.parse_args()
     repo_url = args.repo_url
@@ -120,7 +131,7 @@ def main():
         print("-" * 50)
         
         # Run the pipeline to get the data
-        all_file_data = run_analysis_pipeline(repo_url)
+        all_file_data = run_analysis_pipeline(repo_url, cache_dir=args.cache_dir)
         
         # Generate the CLI report using the collected data
         generate_cli_report(repo_url, all_file_data)